@@ -1,10 +1,11 @@
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # headless: the figure is only saved to disk
 import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.gridspec import GridSpec
 
 input_path = './cleaned_gemini_reddit_stories.csv'
-df = pd.read_csv(input_path)
+df = pd.read_csv(input_path, engine='pyarrow')  # multithreaded Arrow CSV parser
 
 # Print basic info about the dataset
 print("Dataset shape:", df.shape)
@@ -23,6 +24,16 @@ print(f"\nAge groups ({len(age_groups)}):", sorted(age_groups))
 print(f"Income groups ({len(income_groups)}):", sorted(income_groups))
 print(f"Family types ({len(family_types)}):", sorted(family_types))
 
+def fast_hist_uniform(x, nb, lo, hi):
+    """
+    Histogram counts for nb uniform bins over [lo, hi), values outside are dropped.
+    The bin index is computed directly, skipping the searchsorted done by np.histogram.
+    """
+    x = x[(x >= lo) & (x < hi)]
+    # minimum only guards against a rounding up to nb for a value just below hi
+    idx = np.minimum(((x - lo) * (nb / (hi - lo))).astype(np.intp), nb - 1)
+    return np.bincount(idx, minlength=nb)
+
 def create_comprehensive_analysis():
     """
     Create a grid visualization with:
@@ -37,16 +48,17 @@ def create_comprehensive_analysis():
     # Clean and convert numeric columns
     df_clean = df.copy()
     
-    # Convert categorisation columns to numeric, handling errors
-    for col in categorisation_cols:
-        df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-    
-    # Convert number_child to numeric, handling string values
-    df_clean['number_child'] = pd.to_numeric(df_clean['number_child'], errors='coerce')
+    # Convert categorisation columns and number_child to numeric in one pass, handling errors
+    df_clean[analysis_cols] = df_clean[analysis_cols].apply(pd.to_numeric, errors='coerce')
     
     # Remove rows where all categorisation columns are NaN
     df_clean = df_clean.dropna(subset=analysis_cols, how='all')
     
+    # Narrow dtypes: scores are 0-10 so float32 is exact, number_child fits int8
+    # (missing counts become 0, as clean_data.py already does for unknown values)
+    df_clean[categorisation_cols] = df_clean[categorisation_cols].astype('float32')
+    df_clean['number_child'] = df_clean['number_child'].fillna(0).astype('int8')
+    
     print(f"After cleaning: {len(df_clean)} rows remaining")
     
     # Create list of all demographic values with their types (excluding unknown)
@@ -74,16 +86,41 @@ def create_comprehensive_analysis():
     n_rows = len(analysis_cols)
     n_cols = len(all_demographics)
     
-    fig = plt.figure(figsize=(3 * n_cols, 3 * n_rows))
-    gs = GridSpec(n_rows, n_cols, figure=fig, hspace=0.4, wspace=0.3)
+    # All axes created in one layout pass; every row shares its x range and count scale
+    fig, axes = plt.subplots(n_rows, n_cols, sharex='row', sharey='row', squeeze=False,
+                             figsize=(3 * n_cols, 3 * n_rows),
+                             gridspec_kw={'hspace': 0.4, 'wspace': 0.3})
     
     # Color palette
     colors = plt.cm.Set1(np.linspace(0, 1, 10))
     
+    # Row positions and (count, mean, std) of each demographic value, computed once per demographic column
+    groups = {}
+    stats = {}
+    for demo_col in ['age_group', 'income_group', 'family_type']:
+        grouped = df_clean.groupby(demo_col, observed=True)
+        groups[demo_col] = grouped.indices
+        stats[demo_col] = pd.concat({'count': grouped[analysis_cols].count(),
+                                     'mean': grouped[analysis_cols].mean(),
+                                     'std': grouped[analysis_cols].std(ddof=0)}, axis=1)
+    
     # Iterate through each analysis column (rows)
     for row_idx, analysis_col in enumerate(analysis_cols):
         print(f"\nCreating row {row_idx + 1}/{n_rows}: {analysis_col}")
-        
+
+        # Uniform bins shared by every cell of the row, centred on the integer values (children 0-4, scores 1-10)
+        if analysis_col == 'number_child':
+            lo, hi, nb = -0.5, 4.5, 5
+        else:
+            lo, hi, nb = 0.5, 10.5, 10
+        edges = np.linspace(lo, hi, nb + 1)
+        bin_width = (hi - lo) / nb
+        values = df_clean[analysis_col].to_numpy(dtype=np.float32)
+
+        # Axis limits and y label set once per row, shared by the whole row
+        axes[row_idx, 0].set_xlim(lo, hi)
+        axes[row_idx, 0].set_ylabel('Frequency', fontsize=8)
+
         # Add row label on the left
         if row_idx < n_rows:
             row_label = analysis_col.replace("categorisation_", "").replace("_", " ").title()
@@ -103,29 +140,32 @@ def create_comprehensive_analysis():
         
         # Iterate through each demographic value (columns)
         for col_idx, (demo_col, demo_value, demo_label) in enumerate(all_demographics):
-            ax = fig.add_subplot(gs[row_idx, col_idx])
+            ax = axes[row_idx, col_idx]
             
             # Get data for this specific demographic value
-            subset = df_clean[df_clean[demo_col] == demo_value]
+            idx = groups[demo_col].get(demo_value)
             
-            if len(subset) > 0 and analysis_col in subset.columns:
-                data = subset[analysis_col].dropna()
+            if idx is not None and len(idx) > 0:
+                demo_stats = stats[demo_col].loc[demo_value]
+                n = demo_stats[('count', analysis_col)]
                 
-                if len(data) > 0:
+                if n > 0:
                     # Create histogram
-                    ax.hist(data.values, bins=min(10, len(data.unique())), alpha=0.7, 
-                           color=colors[col_idx % len(colors)], 
-                           edgecolor='black', linewidth=0.5)
+                    data = values[idx]
+                    counts = fast_hist_uniform(data[~np.isnan(data)], nb, lo, hi)
+                    ax.bar(edges[:-1], counts, width=bin_width, align='edge', alpha=0.7,
+                           color=colors[col_idx % len(colors)],
+                           edgecolor='black', linewidth=0.5, rasterized=True)
                     
                     # Add statistics
-                    mean_val = np.mean(data)
-                    std_val = np.std(data)
+                    mean_val = demo_stats[('mean', analysis_col)]
+                    std_val = demo_stats[('std', analysis_col)]
                     
                     # Add mean line
                     ax.axvline(mean_val, color='red', linestyle='--', alpha=0.8, linewidth=2)
                     
                     # Add statistics text
-                    stats_text = f'n={len(data)}\nμ={mean_val:.2f}\nσ={std_val:.2f}'
+                    stats_text = f'n={int(n)}\nμ={mean_val:.2f}\nσ={std_val:.2f}'
                     ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, fontsize=8,
                            verticalalignment='top',
                            bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.8))
@@ -138,20 +178,6 @@ def create_comprehensive_analysis():
                     # Only show x-axis label on bottom row
                     if row_idx == n_rows - 1:
                         ax.set_xlabel('Score', fontsize=8)
-                    else:
-                        ax.set_xlabel('')
-                    
-                    # Only show y-axis label on leftmost column
-                    if col_idx == 0:
-                        ax.set_ylabel('Frequency', fontsize=8)
-                    else:
-                        ax.set_ylabel('')
-                    
-                    # Set reasonable axis limits
-                    if analysis_col == 'number_child':
-                        ax.set_xlim(-0.5, 4.5)
-                    else:
-                        ax.set_xlim(0, 10)
                 
                 else:
                     ax.text(0.5, 0.5, 'No Data\n(all NaN)', ha='center', va='center', 
@@ -179,8 +205,7 @@ def create_comprehensive_analysis():
     plt.subplots_adjust(top=0.93, left=0.2)  # Increased left margin to prevent overlap
     
     # Save the plot
-    plt.savefig('comprehensive_demographics_histograms.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.savefig('comprehensive_demographics_histograms.png', dpi=150, bbox_inches='tight')
     
     return fig
 
@@ -194,34 +219,41 @@ print("="*60)
 
 # Clean data for summary
 df_summary = df.copy()
-for col in categorisation_cols:
-    df_summary[col] = pd.to_numeric(df_summary[col], errors='coerce')
-df_summary['number_child'] = pd.to_numeric(df_summary['number_child'], errors='coerce')
+summary_cols = categorisation_cols + ['number_child']
+df_summary[summary_cols] = df_summary[summary_cols].apply(pd.to_numeric, errors='coerce')
+
+# Categorical group keys let groupby aggregate on integer codes
+demo_cols = ['age_group', 'income_group', 'family_type']
+for demo_col in demo_cols:
+    df_summary[demo_col] = df_summary[demo_col].astype('category')
+
+# Group means computed once per demographic column, reused by every section below
+means = {demo_col: df_summary.groupby(demo_col, observed=True)[summary_cols].mean() for demo_col in demo_cols}
 
 # Overall statistics by demographic groups
 print("\n1. AGE GROUP ANALYSIS:")
-age_summary = df_summary.groupby('age_group')[categorisation_cols + ['number_child']].mean().round(3)
+age_summary = means['age_group'].round(3)
 print(age_summary)
 
 print("\n2. INCOME GROUP ANALYSIS:")
-income_summary = df_summary.groupby('income_group')[categorisation_cols + ['number_child']].mean().round(3)
+income_summary = means['income_group'].round(3)
 print(income_summary)
 
 print("\n3. FAMILY TYPE ANALYSIS:")
-family_summary = df_summary.groupby('family_type')[categorisation_cols + ['number_child']].mean().round(3)
+family_summary = means['family_type'].round(3)
 print(family_summary)
 
 # Find highest scoring categories
 print("\n4. HIGHEST SCORING CATEGORIES:")
-for col in categorisation_cols + ['number_child']:
+for col in summary_cols:
     max_score = df_summary[col].max()
     if pd.notna(max_score):
         print(f"\n{col.replace('categorisation_', '').replace('_', ' ').title()}:")
         print(f"  Max score: {max_score}")
         
         # Find which demographics have highest scores
-        for demo_col in ['age_group', 'income_group', 'family_type']:
-            demo_means = df_summary.groupby(demo_col)[col].mean().sort_values(ascending=False)
+        for demo_col in demo_cols:
+            demo_means = means[demo_col][col].sort_values(ascending=False)
             print(f"  Highest in {demo_col}: {demo_means.index[0]} ({demo_means.iloc[0]:.3f})")
 
 print(f"\nVisualization saved as: comprehensive_demographics_histograms.png")
\ No newline at end of file
@@ -1,114 +1,75 @@
 import pandas as pd
-import json
-import ast
+import numpy as np
 import re
+import pyarrow.parquet as pq
 
-def replace_values_with_mapping(df, column_mappings):
+def map_series(s, mapping):
     """
-    Replace values in DataFrame columns using mapping dictionaries.
+    Replace values in a Series using a mapping dictionary.
     
     Parameters:
-    df (pd.DataFrame): The DataFrame to modify
-    column_mappings (dict): Dictionary where keys are column names and values are mapping dictionaries
+    s (pd.Series): The column to clean
+    mapping (dict): Dictionary mapping old values to new values, unmapped values are kept
     
     Returns:
-    pd.DataFrame: DataFrame with replaced values
+    pd.Series: New Series with replaced values, the source DataFrame is not copied
     
     Example:
-    mappings = {
-        'age_group': {
-            '28': '20-30',
-            '28F': '20-30', 
-            'early 20s': '20-30'
-        }
-    }
+    df['age_group'] = map_series(df['age_group'], {
+        '28': '20-30',
+        '28F': '20-30', 
+        'early 20s': '20-30'
+    })
     """
-    df_copy = df.copy()
+    # Convert to string for consistent matching
+    s = s.astype(str)
     
-    for column, mapping in column_mappings.items():
-        if column in df_copy.columns:
-            # Convert to string for consistent matching
-            df_copy[column] = df_copy[column].astype(str)
-            
-            # Apply direct mappings first
-            for old_value, new_value in mapping.items():
-                df_copy[column] = df_copy[column].replace(old_value, new_value)
-    
-    return df_copy
+    # Apply direct mappings in a single hash lookup, unmapped values are kept
+    return s.map(mapping).fillna(s)
 
-def replace_values_with_patterns(df, column_patterns):
+def replace_series_patterns(s, patterns):
     """
-    Replace values in DataFrame columns using regex patterns.
+    Replace values in a Series using regex patterns.
+    All patterns are fused into one alternation and applied in a single pass,
+    where the first pattern matching at a position wins. Replacements are literal strings.
     
     Parameters:
-    df (pd.DataFrame): The DataFrame to modify
-    column_patterns (dict): Dictionary where keys are column names and values are lists of (pattern, replacement) tuples
+    s (pd.Series): The column to clean
+    patterns (list): List of (pattern, replacement) tuples
     
     Returns:
-    pd.DataFrame: DataFrame with replaced values
+    pd.Series: New Series with replaced values, the source DataFrame is not copied
     
     Example:
-    patterns = {
-        'age_group': [
-            (r'.*20.*', '20-30'),  # anything containing "20"
-            (r'.*30.*', '30-40'),  # anything containing "30"
-        ]
-    }
+    df['age_group'] = replace_series_patterns(df['age_group'], [
+        (r'.*20.*', '20-30'),  # anything containing "20"
+        (r'.*30.*', '30-40'),  # anything containing "30"
+    ])
     """
-    df_copy = df.copy()
+    # Convert to string for consistent matching
+    s = s.astype(str)
     
-    for column, patterns in column_patterns.items():
-        if column in df_copy.columns:
-            # Convert to string for consistent matching
-            df_copy[column] = df_copy[column].astype(str)
-            
-            # Apply pattern replacements
-            for pattern, replacement in patterns:
-                df_copy[column] = df_copy[column].str.replace(pattern, replacement, regex=True)
-    
-    return df_copy
-
-input_path = './processed_gemini_reddit_stories.csv'
-df = pd.read_csv(input_path)
-
-# 1) Keep only non-empty values
-col = 'gemini_result'
-s = df[col].dropna().astype(str).str.strip()
-s = s[s.ne('') & s.ne('nan') & s.ne('None')]
-
-# 2) Parse each row into a Python object (dict/list)
-def parse_obj(x):
-    # Already a dict/list? (in case CSV preserved python objects)
-    if isinstance(x, (dict, list)):
-        return x
-    # Try JSON first
-    try:
-        return json.loads(x)
-    except Exception:
-        pass
-    # Try Python literal (handles single quotes, True/False/None)
-    try:
-        return ast.literal_eval(x)
-    except Exception:
-        return None
-
-parsed = s.apply(parse_obj)
-
-# 3) Keep only dicts/lists that normalized can handle
-records = [p for p in parsed.tolist() if isinstance(p, (dict, list))]
+    # Apply pattern replacements, one named group per pattern
+    fused = re.compile('|'.join(f'(?P<g{i}>{pattern})' for i, (pattern, _) in enumerate(patterns)))
+    replacements = {f'g{i}': replacement for i, (_, replacement) in enumerate(patterns)}
+    return s.map(lambda value: fused.sub(lambda match: replacements[match.lastgroup], value),
+                 na_action='ignore')
+
+input_path = './processed_gemini_reddit_stories.parquet'
+
+# gemini.py writes one column per answer field, the story columns are not loaded
+ANSWER_FIELDS = ('age_group', 'income_group', 'family_type', 'number_child')
+
+def is_answer_column(column):
+    return column in ANSWER_FIELDS or column.startswith('categorisation_')
+
+answer_columns = [column for column in pq.read_schema(input_path).names if is_answer_column(column)]
+df_gemini = pd.read_parquet(input_path, columns=answer_columns)
+# Optional: bring along original row index to rejoin later
+df_gemini.insert(0, 'source_index', df_gemini.index)
 
 # Quick diagnostics
-print(f"Total rows: {len(df)}")
-print(f"Non-empty gemini_result: {len(s)}")
-print(f"Parsable objects: {sum(isinstance(p, (dict, list)) for p in parsed)}")
-
-# 4) Normalize
-if records:
-    df_gemini = pd.json_normalize(records, sep="_")
-    # Optional: bring along original row index to rejoin later
-    df_gemini.insert(0, 'source_index', s.index.to_list())
-else:
-    df_gemini = pd.DataFrame()
+print(f"Total rows: {len(df_gemini)}")
 
 print(df_gemini.columns)
 print(df_gemini.shape)
@@ -178,32 +139,40 @@ number_child_mappings = {
     }
 }
 
-def clean_number_child_column(df):
+FIRST_INT_RE = re.compile(r'\d+')
+
+def first_int(value):
+    """
+    First run of digits in value as an int, 0 when there is none or it does not fit in int8
+    (a year or an id, not a child count).
+    """
+    if not isinstance(value, str):
+        return 0
+    match = FIRST_INT_RE.search(value)
+    if match is None:
+        return 0
+    number = int(match.group())
+    return number if number <= np.iinfo(np.int8).max else 0
+
+def clean_number_child(s):
     """
     Clean the number_child column by converting text to numbers and handling edge cases
     """
-    df_copy = df.copy()
-    
     # First apply text mappings
-    df_copy = replace_values_with_mapping(df_copy, number_child_mappings)
+    s = map_series(s, number_child_mappings['number_child'])
     
-    # Convert to string first, then to numeric
-    df_copy['number_child'] = df_copy['number_child'].astype(str)
-    
-    # Handle any remaining edge cases with regex
-    df_copy['number_child'] = df_copy['number_child'].str.extract(r'(\d+)').fillna('0')
-    
-    # Convert to numeric, coercing errors to NaN, then fill NaN with 0
-    df_copy['number_child'] = pd.to_numeric(df_copy['number_child'], errors='coerce').fillna(0).astype(int)
-    
-    return df_copy
+    # Extract the first number of each value in a single pass, missing or text-only values become 0
+    return pd.Series(np.fromiter(map(first_int, s), dtype=np.int8, count=len(s)), index=s.index)
 
-# Apply the mappings
-df_cleaned = replace_values_with_mapping(df_gemini, age_mappings)
-df_cleaned = replace_values_with_mapping(df_cleaned, family_mappings)
+# Apply the mappings column by column on df_gemini, no whole-frame copies
+df_cleaned = df_gemini
+for column_mappings in (age_mappings, family_mappings):
+    for column, mapping in column_mappings.items():
+        if column in df_cleaned.columns:
+            df_cleaned[column] = map_series(df_cleaned[column], mapping)
 
 # Clean the number_child column
-df_cleaned = clean_number_child_column(df_cleaned)
+df_cleaned['number_child'] = clean_number_child(df_cleaned['number_child'])
 
 print("\nAfter cleaning:")
 print("Age groups:", sorted(df_cleaned["age_group"].unique()))
